@@ -1,3 +1,8 @@
-from celery_app.celery import app as celery_app
+# Celery 应用按需加载: 仅导入 celery_app.models 等子模块时不会创建 Celery 实例或执行任务自动发现
+def __getattr__(name):
+    if name == 'celery_app':
+        from celery_app.celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ['celery_app'] 
\ No newline at end of file
+__all__ = ['celery_app']
\ No newline at end of file
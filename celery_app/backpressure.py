@@ -0,0 +1,96 @@
+import time
+import logging
+from celery_app.config import (
+    BACKPRESSURE_QUEUES,
+    BACKPRESSURE_CACHE_SECONDS,
+    BACKPRESSURE_BLOCK_TIMEOUT,
+)
+from celery_app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Redis broker 为不同优先级使用独立的列表, 名称为 <队列名>\x06\x16<优先级>
+PRIORITY_SEP = '\x06\x16'
+PRIORITY_STEPS = [0, 3, 6, 9]
+
+# 队列长度缓存: 队列名 -> (长度, 查询时间)
+_depth_cache = {}
+# 已饱和的队列, 降到低水位以下才移除
+_saturated = set()
+
+class QueueSaturated(Exception):
+    """目标队列已饱和, 任务未发送"""
+    
+    def __init__(self, queue, depth):
+        self.queue = queue
+        self.depth = depth
+        super(QueueSaturated, self).__init__(f"队列 {queue} 已饱和 (长度 {depth})")
+
+def queue_depth(queue):
+    """获取队列长度, 在 BACKPRESSURE_CACHE_SECONDS 内复用上次结果"""
+    cached = _depth_cache.get(queue)
+    now = time.monotonic()
+    if cached and now - cached[1] < BACKPRESSURE_CACHE_SECONDS:
+        return cached[0]
+    
+    pipe = get_redis().pipeline(transaction=False)
+    for step in PRIORITY_STEPS:
+        pipe.llen(f"{queue}{PRIORITY_SEP}{step}" if step else queue)
+    depth = sum(pipe.execute())
+    
+    _depth_cache[queue] = (depth, now)
+    return depth
+
+def is_saturated(queue):
+    """按高低水位判断队列是否饱和, 未配置的队列不限制; 查询失败时不限制"""
+    limits = BACKPRESSURE_QUEUES.get(queue)
+    if not limits:
+        return False
+    
+    try:
+        depth = queue_depth(queue)
+    except Exception as e:
+        logger.warning(f"获取队列 {queue} 长度失败: {str(e)}")
+        return False
+    
+    if depth >= limits['high']:
+        _saturated.add(queue)
+    elif depth <= limits['low']:
+        _saturated.discard(queue)
+    return queue in _saturated
+
+def task_queue(app, task_name, options=None):
+    """任务将发送到的队列名称 (显式指定的 queue 或路由结果)"""
+    queue = (options or {}).get('queue')
+    if not queue:
+        queue = app.amqp.router.route({}, task_name).get('queue')
+    return getattr(queue, 'name', queue) or app.conf.task_default_queue
+
+def submit(task, args=None, kwargs=None, critical=False, **options):
+    """按目标队列的背压策略发送任务, 用法与 task.apply_async 相同
+    
+    shed 策略下丢弃的非关键任务返回 None; 队列饱和且无法等待时抛出 QueueSaturated
+    """
+    queue = task_queue(task.app, task.name, options)
+    
+    if is_saturated(queue):
+        policy = BACKPRESSURE_QUEUES[queue].get('policy', 'block')
+        
+        if policy == 'shed':
+            if not critical:
+                logger.warning(f"队列 {queue} 已饱和, 丢弃非关键任务 {task.name}")
+                return None
+        elif policy == 'reject':
+            raise QueueSaturated(queue, queue_depth(queue))
+        else:
+            deadline = time.monotonic() + BACKPRESSURE_BLOCK_TIMEOUT
+            while is_saturated(queue):
+                if time.monotonic() >= deadline:
+                    raise QueueSaturated(queue, queue_depth(queue))
+                time.sleep(BACKPRESSURE_CACHE_SECONDS)
+    
+    return task.apply_async(args=args, kwargs=kwargs, **options)
+
+def delay(task, *args, **kwargs):
+    """submit 的简写, 对应 task.delay"""
+    return submit(task, args=args, kwargs=kwargs)
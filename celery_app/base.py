@@ -0,0 +1,15 @@
+from celery import Task
+from celery.exceptions import Ignore
+
+class RateLimitedTask(Task):
+    """任务基类: task_prerun 中被限流的任务不执行, 以相同 task_id 延迟重新入队 (见 celery_app.ratelimit)"""
+    
+    def __call__(self, *args, **kwargs):
+        countdown = getattr(self.request, 'rate_limit_countdown', None)
+        if countdown:
+            # signature_from_request 保留链、回调、组等工作流信息, 与 retry 一致
+            self.signature_from_request(args=args, kwargs=kwargs).apply_async(countdown=countdown)
+            raise Ignore()
+        # 与 Celery 对重写了 __call__ 的任务的处理一致, 直接调用 run:
+        # Task.__call__ 会压入新的请求上下文, 任务内的 self.request.id 变为 None, retry() 直接抛出原异常
+        return self.run(*args, **kwargs)
@@ -1,7 +1,7 @@
 from celery import Celery
 
-# 创建 Celery 实例
-app = Celery('celery_app')
+# 创建 Celery 实例, 任务基类支持按数据库配置限流 (按名称延迟加载)
+app = Celery('celery_app', task_cls='celery_app.base:RateLimitedTask')
 
 # 加载配置
 app.config_from_object('celery_app.config')
@@ -17,6 +17,12 @@ enable_utc = True
 # 添加新的配置项，解决启动时连接重试的警告
 broker_connection_retry_on_startup = True
 
+# Worker 子进程回收配置
+# 每个子进程执行指定数量的任务后被替换, 避免内存泄漏持续累积
+worker_max_tasks_per_child = 1000
+# 子进程常驻内存超过该值(KB)时, 在当前任务完成后被替换
+worker_max_memory_per_child = 512000
+
 # 添加自定义调度器配置
 beat_scheduler = 'celery_app.scheduler.DatabaseScheduler'
 
@@ -27,4 +33,86 @@ DATABASE_CONFIG = {
     'user': 'gaochao',
     'password': 'fffjjj',
     'database': 'celery_tasks',
-} 
\ No newline at end of file
+} 
+
+# 定时任务变更通知配置
+# 写入方修改定时任务后递增版本号并在频道上发布消息, Beat 订阅后立即重新加载
+SCHEDULE_VERSION_KEY = 'celery:periodic_task_configs:version'
+SCHEDULE_CHANGE_CHANNEL = 'celery:periodic_task_configs:changed'
+# Beat 检查变更通知的间隔(秒)
+SCHEDULE_CHECK_INTERVAL = 1
+# Beat 比对版本号的间隔(秒), 用于兜底丢失的订阅消息
+SCHEDULE_VERSION_CHECK_INTERVAL = 10
+# 兜底的数据库全量轮询间隔(秒), Redis 不可用时依赖此间隔
+SCHEDULE_FALLBACK_POLL_INTERVAL = 300
+
+
+# 任务采样分析配置
+# 键为任务名称, 值为采样间隔 N (平均每 N 次执行采样一次, 1 表示每次都采样)
+PROFILE_TASKS = {
+    # 'celery_app.tasks.long_running_task': 500,
+}
+# 分析结果目录, 文件保存为 <PROFILE_DIR>/<任务名称>/<task_id>.pstats
+PROFILE_DIR = '/tmp/celery_profiles'
+# 每个任务最多保留的分析文件数, 超出时删除最旧的文件
+PROFILE_MAX_FILES = 200
+
+
+# 任务小时汇总配置
+# 只汇总写入时间 (update_time) 早于 (当前时间 - 延迟) 的记录, 避免遗漏尚未提交的记录
+ROLLUP_LAG_SECONDS = 60
+# 首次汇总时回溯的天数
+ROLLUP_INITIAL_DAYS = 1
+# 执行耗时分布的桶上界(秒), 最后一个桶记录超过最大上界的任务
+ROLLUP_DURATION_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 600, 1800, 3600]
+
+
+# 生产端背压配置
+# 按队列配置高低水位: 队列长度达到 high 后视为饱和, 降到 low 以下才恢复
+# policy: block (等待队列恢复, 超时后拒绝) / reject (直接拒绝) / shed (丢弃非关键任务, 关键任务照常发送)
+BACKPRESSURE_QUEUES = {
+    'celery': {'high': 10000, 'low': 8000, 'policy': 'block'},
+}
+# 队列长度缓存时间(秒), 避免每次发送都查询 broker
+BACKPRESSURE_CACHE_SECONDS = 1
+# block 策略的最长等待时间(秒)
+BACKPRESSURE_BLOCK_TIMEOUT = 30
+# Beat 遇到饱和队列时对非关键定时任务的处理: skip (跳过本次) / defer (队列恢复后补发一次)
+BACKPRESSURE_BEAT_POLICY = 'skip'
+
+
+# 任务生命周期记录专用连接的超时(秒), 只作用于记录写入, 不影响报表等长查询
+RECORDER_DB_CONNECT_TIMEOUT = 3
+RECORDER_DB_READ_TIMEOUT = 10
+RECORDER_DB_WRITE_TIMEOUT = 10
+
+# 任务生命周期记录的熔断与本地暂存配置
+# 记录先追加到本地暂存文件, 由后台线程写入数据库
+# 连续失败达到阈值后熔断, 记录保留在暂存文件; 经过恢复时间后尝试写入一次, 成功则恢复
+DB_BREAKER_FAILURE_THRESHOLD = 3
+DB_BREAKER_RESET_TIMEOUT = 30
+# 暂存目录, 每个 Worker 进程写入 records-<pid>.jsonl
+SPOOL_DIR = '/tmp/celery_spool'
+# 累计写入条数达到阈值时立即 fsync, 否则由后台线程每隔 SPOOL_FSYNC_INTERVAL 秒 fsync
+# 后台线程每个 SPOOL_FSYNC_INTERVAL 最多向数据库回放一次暂存记录
+SPOOL_FSYNC_BATCH = 50
+SPOOL_FSYNC_INTERVAL = 1.0
+# 写入数据库失败后的重试间隔(秒)
+SPOOL_REPLAY_INTERVAL = 5
+# 认领已退出进程遗留暂存文件的扫描间隔(秒)
+SPOOL_CLAIM_INTERVAL = 60
+
+
+# 任务限流配置 (限流规则保存在 celery_task_rate_limits 表)
+# 规则变更后递增版本号, Worker 的后台线程比对版本号后重新加载
+RATE_LIMIT_VERSION_KEY = 'celery:task_rate_limits:version'
+# Worker 比对版本号的间隔(秒)
+RATE_LIMIT_REFRESH_SECONDS = 5
+# 兜底的数据库全量加载间隔(秒)
+RATE_LIMIT_FALLBACK_REFRESH_SECONDS = 60
+# 并发占用的租约时间(秒), Worker 异常退出时占用在租约到期后自动释放
+RATE_LIMIT_LEASE_SECONDS = 3600
+# 达到并发上限时的重新入队延迟(秒)
+RATE_LIMIT_RETRY_DELAY = 5
+# 重新入队延迟附加的随机抖动上限(秒), 避免被推迟的任务同时到期
+RATE_LIMIT_JITTER = 1
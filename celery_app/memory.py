@@ -0,0 +1,40 @@
+import resource
+import sys
+
+# 进程内存统计 (单位: KB)
+# Linux 下读取 /proc/self/status, 并通过 /proc/self/clear_refs 重置峰值以获得单个任务的峰值内存;
+# 其他平台退化为 ru_maxrss (进程启动以来的峰值)
+
+def _read_status(field):
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _maxrss():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 下 ru_maxrss 单位为字节
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+def current_rss():
+    """当前进程常驻内存 (KB)"""
+    rss = _read_status('VmRSS')
+    return rss if rss is not None else _maxrss()
+
+def peak_rss():
+    """自上次 reset_peak_rss 以来的峰值常驻内存 (KB)"""
+    peak = _read_status('VmHWM')
+    return peak if peak is not None else _maxrss()
+
+def reset_peak_rss():
+    """重置进程峰值内存统计, 失败时返回 False (峰值将包含此前的任务)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
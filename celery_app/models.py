@@ -1,22 +1,21 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, Float, Index, UniqueConstraint
+from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
-import pymysql
-from celery_app.config import DATABASE_CONFIG
+from celery_app.config import DATABASE_CONFIG, RECORDER_DB_CONNECT_TIMEOUT, RECORDER_DB_READ_TIMEOUT, RECORDER_DB_WRITE_TIMEOUT
 
-# 注册 PyMySQL 作为 MySQLdb
-pymysql.install_as_MySQLdb()
-
-# 创建数据库连接
+# 数据库连接在首次使用时创建, 仅导入模型时不加载驱动也不创建连接池
 DB_URL = f"mysql://{DATABASE_CONFIG['user']}:{DATABASE_CONFIG['password']}@{DATABASE_CONFIG['host']}:{DATABASE_CONFIG['port']}/{DATABASE_CONFIG['database']}"
-engine = create_engine(DB_URL, echo=False)
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
+RecorderSession = sessionmaker()
 Base = declarative_base()
+_engine = None
+_recorder_engine = None
 
 class Task(Base):
     """任务模型"""
     __tablename__ = 'celery_task_records'
+    # 增量汇总按 未汇总 + 写入时间范围 扫描
+    __table_args__ = (Index('idx_task_rolled_up_update_time', 'task_rolled_up', 'update_time'),)
     
     id = Column(Integer, primary_key=True)
     task_id = Column(String(255), unique=True, nullable=False, index=True)
@@ -33,6 +32,13 @@ class Task(Base):
     task_retry_count = Column(Integer, default=0)
     task_args = Column(Text, nullable=True)
     task_kwargs = Column(Text, nullable=True)
+    task_root_id = Column(String(255), nullable=True, index=True)  # 工作流根任务ID
+    task_parent_id = Column(String(255), nullable=True)  # 父任务ID
+    task_group_id = Column(String(255), nullable=True, index=True)  # 所属组ID
+    task_rss_before = Column(Integer, nullable=True)  # 任务开始时内存(KB)
+    task_rss_after = Column(Integer, nullable=True)  # 任务结束时内存(KB)
+    task_rss_peak = Column(Integer, nullable=True)  # 任务执行期间峰值内存(KB)
+    task_rolled_up = Column(Boolean, default=False)  # 是否已计入小时汇总
     
     def __repr__(self):
         return f"<Task {self.task_id} ({self.task_status})>"
@@ -71,6 +77,7 @@ class PeriodicTask(Base):
     task_args = Column(Text, nullable=True)  # JSON 格式的参数
     task_kwargs = Column(Text, nullable=True)  # JSON 格式的关键字参数
     task_enabled = Column(Boolean, default=True)
+    task_critical = Column(Boolean, default=True)  # 关键任务在队列饱和时仍照常发送
     task_last_run_time = Column(DateTime, nullable=True)
     task_run_count = Column(Integer, default=0)
     create_time = Column(DateTime, default=datetime.now)
@@ -82,10 +89,92 @@ class PeriodicTask(Base):
     def __repr__(self):
         return f"<PeriodicTask {self.task_name}>"
 
+class TaskRateLimit(Base):
+    """任务限流配置模型"""
+    __tablename__ = 'celery_task_rate_limits'
+    
+    id = Column(Integer, primary_key=True)
+    task_name = Column(String(255), unique=True, nullable=False)
+    task_rate_limit = Column(Float, nullable=True)  # 每秒允许启动的任务数, 为空不限制
+    task_rate_burst = Column(Integer, nullable=True)  # 令牌桶容量, 为空时取 max(1, 每秒任务数)
+    task_max_concurrency = Column(Integer, nullable=True)  # 所有 Worker 合计的最大并发数, 为空不限制
+    task_limit_enabled = Column(Boolean, default=True)
+    create_time = Column(DateTime, default=datetime.now)
+    update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    create_by = Column(String(100), nullable=True)
+    update_by = Column(String(100), nullable=True)
+    task_description = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<TaskRateLimit {self.task_name}>"
+
+class TaskHourlyStat(Base):
+    """异步任务小时汇总"""
+    __tablename__ = 'celery_task_hourly_stats'
+    __table_args__ = (UniqueConstraint('stat_hour', 'task_name', 'task_status', name='uk_hour_name_status'),)
+    
+    id = Column(Integer, primary_key=True)
+    stat_hour = Column(DateTime, nullable=False)  # 统计小时 (按完成时间)
+    task_name = Column(String(255), nullable=False)
+    task_status = Column(String(50), nullable=False)
+    task_count = Column(Integer, default=0)
+    duration_sum = Column(Float, default=0)  # 执行耗时合计(秒)
+    duration_min = Column(Float, nullable=True)
+    duration_max = Column(Float, nullable=True)
+    duration_buckets = Column(Text, nullable=True)  # JSON 格式的耗时分布 (见 config.ROLLUP_DURATION_BUCKETS)
+    create_time = Column(DateTime, default=datetime.now)
+    update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<TaskHourlyStat {self.task_name} {self.task_status} at {self.stat_hour}>"
+
+class RollupWatermark(Base):
+    """汇总任务水位"""
+    __tablename__ = 'celery_rollup_watermarks'
+    
+    id = Column(Integer, primary_key=True)
+    rollup_name = Column(String(100), unique=True, nullable=False)
+    rollup_watermark = Column(DateTime, nullable=False)  # 已汇总到的写入时间 update_time (不含)
+    create_time = Column(DateTime, default=datetime.now)
+    update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<RollupWatermark {self.rollup_name} {self.rollup_watermark}>"
+
+# 获取数据库引擎
+def get_engine():
+    global _engine
+    if _engine is None:
+        import pymysql
+        # 注册 PyMySQL 作为 MySQLdb
+        pymysql.install_as_MySQLdb()
+        _engine = create_engine(DB_URL, echo=False)
+        Session.configure(bind=_engine)
+    return _engine
+
+# 获取任务生命周期记录专用的数据库引擎, 使用较短的超时以便尽快熔断
+def get_recorder_engine():
+    global _recorder_engine
+    if _recorder_engine is None:
+        get_engine()  # 确保已注册 PyMySQL
+        _recorder_engine = create_engine(DB_URL, echo=False, connect_args={
+            'connect_timeout': RECORDER_DB_CONNECT_TIMEOUT,
+            'read_timeout': RECORDER_DB_READ_TIMEOUT,
+            'write_timeout': RECORDER_DB_WRITE_TIMEOUT,
+        })
+        RecorderSession.configure(bind=_recorder_engine)
+    return _recorder_engine
+
 # 创建数据库表
 def init_db():
-    Base.metadata.create_all(engine)
+    Base.metadata.create_all(get_engine())
 
 # 获取数据库会话
 def get_session():
-    return Session() 
\ No newline at end of file
+    get_engine()
+    return Session() 
+
+# 获取任务生命周期记录专用的数据库会话
+def get_recorder_session():
+    get_recorder_engine()
+    return RecorderSession()
\ No newline at end of file
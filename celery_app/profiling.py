@@ -0,0 +1,69 @@
+import os
+import random
+import cProfile
+import logging
+from celery_app.config import PROFILE_TASKS, PROFILE_DIR, PROFILE_MAX_FILES
+
+logger = logging.getLogger(__name__)
+
+# 正在采样的任务, 以 task_id 为键
+_profilers = {}
+
+def profile_path(task_name, task_id=None):
+    """任务分析文件所在目录, 传入 task_id 时返回具体文件路径"""
+    directory = os.path.join(PROFILE_DIR, task_name)
+    if task_id is None:
+        return directory
+    return os.path.join(directory, f"{task_id}.pstats")
+
+def profile_files(task_name):
+    """任务的分析文件, 按修改时间从旧到新排列, 返回 [(修改时间, 路径)]"""
+    directory = profile_path(task_name)
+    files = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return files
+    for name in names:
+        if not name.endswith('.pstats'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            files.append((os.path.getmtime(path), path))
+        except OSError:
+            pass  # 已被其他进程清理
+    return sorted(files)
+
+def prune_profiles(task_name):
+    """只保留最新的 PROFILE_MAX_FILES 个分析文件"""
+    files = profile_files(task_name)
+    for _, path in files[:max(len(files) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def start_profile(task_id, task_name):
+    """按配置的采样间隔决定是否对本次执行进行分析"""
+    rate = PROFILE_TASKS.get(task_name)
+    if not rate or random.randint(1, rate) != 1:
+        return
+    
+    profiler = cProfile.Profile()
+    _profilers[task_id] = (task_name, profiler)
+    profiler.enable()
+
+def stop_profile(task_id):
+    """停止分析并写入 .pstats 文件"""
+    item = _profilers.pop(task_id, None)
+    if item is None:
+        return
+    
+    task_name, profiler = item
+    profiler.disable()
+    try:
+        os.makedirs(profile_path(task_name), exist_ok=True)
+        profiler.dump_stats(profile_path(task_name, task_id))
+        prune_profiles(task_name)
+    except Exception as e:
+        logger.error(f"保存任务分析结果错误: {str(e)}")
@@ -0,0 +1,172 @@
+import os
+import time
+import random
+import logging
+import threading
+from celery_app.models import get_session, TaskRateLimit
+from celery_app.redis_client import get_redis
+from celery_app.config import (
+    RATE_LIMIT_VERSION_KEY,
+    RATE_LIMIT_REFRESH_SECONDS,
+    RATE_LIMIT_FALLBACK_REFRESH_SECONDS,
+    RATE_LIMIT_LEASE_SECONDS,
+    RATE_LIMIT_RETRY_DELAY,
+    RATE_LIMIT_JITTER,
+)
+
+# 跨 Worker 的任务限流: Redis 令牌桶限制启动速率, 有序集合 (成员为 task_id, 分数为租约到期时间) 限制并发数
+# 被限流的任务带延迟重新入队, 不占用 Worker 进程等待
+# 规则由后台线程刷新, 任务执行路径只读取进程内缓存, 不访问数据库
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'celery:ratelimit:bucket:{}'
+RUNNING_KEY = 'celery:ratelimit:running:{}'
+
+# 返回 0 表示获取成功, -1 表示达到并发上限, 其他值为需要等待的秒数
+# 使用 Redis 服务器时间, 各 Worker 主机的时钟偏差不影响令牌补充与租约到期
+ACQUIRE_SCRIPT = """
+-- Redis 5 之前的版本需要先切换为按命令复制, 才能在调用 TIME 后写入
+redis.replicate_commands()
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_concurrency = tonumber(ARGV[3])
+local lease = tonumber(ARGV[5])
+
+if max_concurrency > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    if not redis.call('ZSCORE', KEYS[2], ARGV[4]) and redis.call('ZCARD', KEYS[2]) >= max_concurrency then
+        return '-1'
+    end
+end
+
+if rate > 0 then
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        return tostring((1 - tokens) / rate)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+end
+
+if max_concurrency > 0 then
+    redis.call('ZADD', KEYS[2], now + lease, ARGV[4])
+    redis.call('EXPIRE', KEYS[2], lease)
+end
+return '0'
+"""
+
+class _LimitCache(object):
+    """进程内的限流规则缓存, 由后台线程在版本号变化或到达兜底间隔时从数据库重新加载"""
+    
+    def __init__(self):
+        self.limits = {}
+        self.version = None
+        self.loaded_at = None
+        self.pid = None
+    
+    def get(self, task_name):
+        self.start()
+        return self.limits.get(task_name)
+    
+    def start(self):
+        """启动当前进程的刷新线程, prefork 子进程首次使用时重新启动"""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            threading.Thread(target=self._refresh_loop, name='rate-limit-refresher', daemon=True).start()
+    
+    def _refresh_loop(self):
+        pid = self.pid
+        while pid == os.getpid():
+            self.refresh()
+            time.sleep(RATE_LIMIT_REFRESH_SECONDS)
+    
+    def refresh(self):
+        try:
+            version = get_redis().get(RATE_LIMIT_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"获取限流规则版本号失败: {str(e)}")
+            version = self.version
+        now = time.monotonic()
+        if self.loaded_at is None or version != self.version or now - self.loaded_at >= RATE_LIMIT_FALLBACK_REFRESH_SECONDS:
+            if self.load():
+                self.version = version
+                self.loaded_at = now
+    
+    def load(self):
+        """加载启用的规则, 返回是否加载成功"""
+        session = get_session()
+        try:
+            limits = {}
+            for limit in session.query(TaskRateLimit).filter_by(task_limit_enabled=True).all():
+                rate = limit.task_rate_limit or 0
+                limits[limit.task_name] = {
+                    'rate': rate,
+                    'burst': limit.task_rate_burst or max(1, int(rate)),
+                    'max_concurrency': limit.task_max_concurrency or 0,
+                }
+            # 整体替换, 任务执行路径读取时无需加锁
+            self.limits = limits
+            return True
+        except Exception as e:
+            # 保留上次加载的规则
+            logger.error(f"加载限流规则错误: {str(e)}")
+            return False
+        finally:
+            session.close()
+
+_cache = _LimitCache()
+_acquire = None
+
+def acquire(task_name, task_id):
+    """获取启动许可, 返回 (重新入队延迟(秒), 是否占用了并发名额)
+    
+    延迟为 0 表示可以执行; 占用了并发名额的任务结束后需要调用 release. Redis 不可用时不限流
+    """
+    global _acquire
+    limit = _cache.get(task_name)
+    if not limit or (not limit['rate'] and not limit['max_concurrency']):
+        return 0, False
+    
+    try:
+        if _acquire is None:
+            _acquire = get_redis().register_script(ACQUIRE_SCRIPT)
+        result = float(_acquire(
+            keys=[BUCKET_KEY.format(task_name), RUNNING_KEY.format(task_name)],
+            args=[limit['rate'], limit['burst'], limit['max_concurrency'], task_id, RATE_LIMIT_LEASE_SECONDS]
+        ))
+    except Exception as e:
+        logger.warning(f"任务限流检查失败, 不限流执行: {str(e)}")
+        return 0, False
+    
+    if result == 0:
+        return 0, bool(limit['max_concurrency'])
+    delay = RATE_LIMIT_RETRY_DELAY if result < 0 else result
+    return delay + random.uniform(0, RATE_LIMIT_JITTER), False
+
+def release(task_name, task_id):
+    """任务结束后释放并发占用
+    
+    不依赖当前缓存的规则: 执行期间规则被删除或停用时, 已占用的名额同样需要释放
+    """
+    try:
+        get_redis().zrem(RUNNING_KEY.format(task_name), task_id)
+    except Exception as e:
+        logger.warning(f"释放任务并发占用失败: {str(e)}")
+
+def start_refresher():
+    """在 Worker 子进程启动时预先加载规则, 避免首批任务在规则加载前不受限流"""
+    _cache.start()
+
+def notify_rate_limits_changed():
+    """限流规则变更后调用, Worker 在 RATE_LIMIT_REFRESH_SECONDS 内重新加载"""
+    try:
+        return get_redis().incr(RATE_LIMIT_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"发布限流规则变更通知失败: {str(e)}")
+        return None
@@ -0,0 +1,301 @@
+import os
+import glob
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from celery_app.models import get_recorder_session, Task
+from celery_app.config import (
+    DB_BREAKER_FAILURE_THRESHOLD,
+    DB_BREAKER_RESET_TIMEOUT,
+    SPOOL_DIR,
+    SPOOL_FSYNC_BATCH,
+    SPOOL_FSYNC_INTERVAL,
+    SPOOL_REPLAY_INTERVAL,
+    SPOOL_CLAIM_INTERVAL,
+)
+
+# 任务生命周期记录 (prerun/postrun/failure) 的写入
+# 信号处理函数只追加到本地暂存文件, 由后台线程按顺序写入数据库, 任务耗时不受数据库延迟影响
+# 数据库异常时熔断, 暂存记录保留到数据库恢复后再回放
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker(object):
+    """熔断器: 连续失败达到阈值后打开, 经过恢复时间后放行一次尝试"""
+    
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # 半开状态: 放行一次, 失败后重新计时
+                self._opened_at = time.monotonic()
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("数据库写入恢复, 熔断关闭")
+            self._failures = 0
+            self._opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"数据库写入连续失败 {self._failures} 次, 熔断打开")
+                self._opened_at = time.monotonic()
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+# 写入函数需要幂等: 暂存文件在部分回放失败后会整体重新回放
+# 不同 Worker 进程的暂存文件回放顺序不确定, 早于当前执行开始时间的记录属于之前的执行, 直接跳过
+
+def _is_stale(task_record, record_time):
+    # MySQL DATETIME 精确到秒, 与 write_prerun 一样留出 1 秒误差
+    return task_record.task_start_time is not None and record_time < task_record.task_start_time - timedelta(seconds=1)
+
+def write_prerun(record):
+    session = get_recorder_session()
+    try:
+        start_time = _parse_time(record['time'])
+        existing_task = session.query(Task).filter_by(task_id=record['task_id']).first()
+        
+        if existing_task:
+            # MySQL DATETIME 精确到秒, 开始时间不早于本条记录说明已写入过
+            if existing_task.task_start_time and existing_task.task_start_time >= start_time - timedelta(seconds=1):
+                return
+            # 更新现有任务
+            existing_task.task_status = 'STARTED'
+            existing_task.task_start_time = start_time
+            existing_task.task_retry_count += 1
+            existing_task.task_rolled_up = False  # 重新执行的任务需要再次汇总
+            existing_task.update_by = 'system'  # 添加更新人
+        else:
+            # 创建新任务记录
+            session.add(Task(
+                task_id=record['task_id'],
+                task_name=record['task_name'],
+                task_status='STARTED',
+                create_time=start_time,
+                task_start_time=start_time,
+                task_args=record['task_args'],
+                task_kwargs=record['task_kwargs'],
+                task_root_id=record['task_root_id'],
+                task_parent_id=record['task_parent_id'],
+                task_group_id=record['task_group_id'],
+                create_by='system',  # 添加创建人
+                update_by='system'   # 添加更新人
+            ))
+        
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def write_postrun(record):
+    session = get_recorder_session()
+    try:
+        complete_time = _parse_time(record['time'])
+        task_record = session.query(Task).filter_by(task_id=record['task_id']).first()
+        if task_record and not _is_stale(task_record, complete_time):
+            task_record.task_status = record['state']
+            task_record.task_complete_time = complete_time
+            task_record.task_result = record['task_result']
+            task_record.task_rss_before = record['task_rss_before']
+            task_record.task_rss_after = record['task_rss_after']
+            task_record.task_rss_peak = record['task_rss_peak']
+            task_record.update_by = 'system'  # 添加更新人
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def write_failure(record):
+    session = get_recorder_session()
+    try:
+        complete_time = _parse_time(record['time'])
+        task_record = session.query(Task).filter_by(task_id=record['task_id']).first()
+        if task_record and not _is_stale(task_record, complete_time):
+            task_record.task_status = 'FAILURE'
+            task_record.task_complete_time = complete_time
+            task_record.task_traceback = record['task_traceback']
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+WRITERS = {
+    'prerun': write_prerun,
+    'postrun': write_postrun,
+    'failure': write_failure,
+}
+
+class Spool(object):
+    """进程级的本地暂存文件, 追加写入并批量 fsync, 有新记录时唤醒后台写入线程"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"records-{self.pid}.jsonl")
+        self.lock = threading.RLock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.wakeup = threading.Event()
+        # 待回放文件按写入顺序保存在内存中, 回放时不扫描目录; pid 被复用时本进程可能已有遗留文件
+        self._replay_paths = sorted(glob.glob(os.path.join(directory, f"records-{self.pid}-*.replay")))
+        self.claimed_at = None
+        self.pending = bool(self._replay_paths)
+        self.claim_orphans()
+    
+    def append(self, kind, record):
+        with self.lock:
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps({'kind': kind, 'record': record}, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            self.pending = True
+            # 按时间间隔的 fsync 由后台线程执行
+            if self._unsynced >= SPOOL_FSYNC_BATCH:
+                self.sync()
+        self.wakeup.set()
+    
+    def sync(self):
+        with self.lock:
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+    
+    def claim_orphans(self):
+        """认领已退出进程遗留的暂存文件, 由后台线程每 SPOOL_CLAIM_INTERVAL 秒执行一次"""
+        self.claimed_at = time.monotonic()
+        # 遗留文件中 .replay 早于 .jsonl, 按此顺序认领以保持记录顺序
+        candidates = sorted(glob.glob(os.path.join(self.directory, 'records-*.replay')))
+        candidates += glob.glob(os.path.join(self.directory, 'records-*.jsonl'))
+        for path in candidates:
+            try:
+                pid = int(os.path.basename(path)[len('records-'):].split('-')[0].split('.')[0])
+            except ValueError:
+                continue
+            if pid == self.pid or _pid_alive(pid):
+                continue
+            claimed = self._new_replay_path()
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # 已被其他进程认领
+            with self.lock:
+                self._replay_paths.append(claimed)
+                self.pending = True
+    
+    def _new_replay_path(self):
+        return os.path.join(self.directory, f"records-{self.pid}-{time.time_ns()}.replay")
+    
+    def _rotate(self):
+        """将当前暂存文件轮转为待回放文件, 新记录写入新文件"""
+        with self.lock:
+            if self._file is None:
+                return
+            self.sync()
+            self._file.close()
+            self._file = None
+            path = self._new_replay_path()
+            os.rename(self.path, path)
+            self._replay_paths.append(path)
+    
+    def replay(self):
+        """按顺序回放暂存记录, 任一条失败即停止, 返回是否全部回放完成"""
+        self._rotate()
+        while self._replay_paths:
+            path = self._replay_paths[0]
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # 进程崩溃可能留下不完整的最后一行
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"跳过无法解析的暂存记录: {path}")
+                        continue
+                    WRITERS[item['kind']](item['record'])
+            os.remove(path)
+            with self.lock:
+                self._replay_paths.pop(0)
+            logger.debug(f"暂存记录回放完成: {path}")
+        
+        with self.lock:
+            if self._file is None and not self._replay_paths:
+                self.pending = False
+        return not self.pending
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+breaker = CircuitBreaker(DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_TIMEOUT)
+
+_spool = None
+
+def _get_spool():
+    """获取当前进程的暂存文件, prefork 子进程首次使用时创建并启动写入线程"""
+    global _spool
+    if _spool is None or _spool.pid != os.getpid():
+        _spool = Spool(SPOOL_DIR)
+        threading.Thread(target=_replay_loop, args=(_spool,), name='spool-writer', daemon=True).start()
+    return _spool
+
+def _replay_loop(spool):
+    last_replay = 0
+    while spool.pid == os.getpid():
+        spool.wakeup.wait(SPOOL_FSYNC_INTERVAL)
+        # 每个间隔最多回放一次, 间隔内的新记录合并写入, 轮转文件的开销不随记录数增长
+        delay = SPOOL_FSYNC_INTERVAL - (time.monotonic() - last_replay)
+        if delay > 0:
+            time.sleep(delay)
+        spool.wakeup.clear()
+        try:
+            spool.sync()
+            if time.monotonic() - spool.claimed_at >= SPOOL_CLAIM_INTERVAL:
+                spool.claim_orphans()
+            if spool.pending and breaker.allow():
+                last_replay = time.monotonic()
+                spool.replay()
+                breaker.record_success()
+        except Exception as e:
+            logger.error(f"任务记录写入错误, 保留在本地暂存: {str(e)}")
+            breaker.record_failure()
+            # 失败后等待一段时间再重试, 熔断前不连续冲击数据库
+            time.sleep(SPOOL_REPLAY_INTERVAL)
+
+def record(kind, data):
+    """记录任务生命周期事件: 追加到本地暂存文件, 由后台线程写入数据库"""
+    try:
+        _get_spool().append(kind, data)
+    except Exception as e:
+        logger.error(f"任务记录暂存错误: {str(e)}")
@@ -0,0 +1,11 @@
+from celery_app.config import broker_url
+
+_client = None
+
+def get_redis():
+    """获取 Redis 连接 (与 broker 使用同一个 Redis)"""
+    global _client
+    if _client is None:
+        import redis  # 延迟导入, 不使用 Redis 的命令无需加载
+        _client = redis.Redis.from_url(broker_url, socket_timeout=5, socket_connect_timeout=5)
+    return _client
@@ -0,0 +1,173 @@
+import json
+import bisect
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from celery_app.models import Task, TaskHourlyStat, RollupWatermark
+from celery_app.config import ROLLUP_LAG_SECONDS, ROLLUP_INITIAL_DAYS, ROLLUP_DURATION_BUCKETS
+
+# 水位表中本汇总的名称
+ROLLUP_NAME = 'task_hourly_stats'
+# 只汇总最终状态; 重试时 task_postrun 以 RETRY 状态触发, 计入会把一次任务统计为多次
+TERMINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+# 标记已汇总记录时每条 UPDATE 的 ID 数
+MARK_BATCH_SIZE = 1000
+
+def _hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def _new_stat():
+    return {'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'buckets': [0] * (len(ROLLUP_DURATION_BUCKETS) + 1)}
+
+def _merge_buckets(a, b):
+    """合并两个耗时分布, 桶配置变化时按较长的一方补齐"""
+    size = max(len(a), len(b))
+    return [(a[i] if i < len(a) else 0) + (b[i] if i < len(b) else 0) for i in range(size)]
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+def rollup_task_stats(session):
+    """将水位之后写入的任务记录汇总到小时表, 由调用方提交事务
+    
+    水位按写入时间 (update_time) 推进, 数据库恢复后才回放的记录即使完成时间较早也会被汇总,
+    计入其完成时间所在的小时; 已汇总的记录打上标记, 回放重复写入时不会重复计数
+    
+    返回 (本次汇总的记录数, 新水位)
+    """
+    end = datetime.now() - timedelta(seconds=ROLLUP_LAG_SECONDS)
+    
+    # 锁定水位行, 防止并发汇总重复计数
+    watermark = session.query(RollupWatermark).filter_by(rollup_name=ROLLUP_NAME).with_for_update().first()
+    if watermark is None:
+        watermark = RollupWatermark(
+            rollup_name=ROLLUP_NAME,
+            rollup_watermark=_hour(end) - timedelta(days=ROLLUP_INITIAL_DAYS)
+        )
+        session.add(watermark)
+    
+    start = watermark.rollup_watermark
+    if start >= end:
+        return 0, start
+    
+    # 只扫描水位之后写入且未汇总的记录 (使用 idx_task_rolled_up_update_time 索引)
+    rows = session.query(
+        Task.id, Task.task_name, Task.task_status, Task.task_start_time, Task.task_complete_time
+    ).filter(
+        Task.update_time >= start,
+        Task.update_time < end,
+        Task.task_status.in_(TERMINAL_STATES),
+        Task.task_complete_time.isnot(None),
+        Task.task_rolled_up == False
+    ).yield_per(5000)
+    
+    stats = {}
+    ids = []
+    for task_pk, task_name, task_status, start_time, complete_time in rows:
+        ids.append(task_pk)
+        stat = stats.setdefault((_hour(complete_time), task_name, task_status), _new_stat())
+        stat['count'] += 1
+        if start_time is None:
+            continue
+        duration = max((complete_time - start_time).total_seconds(), 0.0)
+        stat['sum'] += duration
+        stat['min'] = _min(stat['min'], duration)
+        stat['max'] = _max(stat['max'], duration)
+        stat['buckets'][bisect.bisect_left(ROLLUP_DURATION_BUCKETS, duration)] += 1
+    
+    if stats:
+        hours = {key[0] for key in stats}
+        existing = {
+            (row.stat_hour, row.task_name, row.task_status): row
+            for row in session.query(TaskHourlyStat).filter(TaskHourlyStat.stat_hour.in_(hours)).all()
+        }
+        
+        for key, stat in stats.items():
+            row = existing.get(key)
+            if row is None:
+                session.add(TaskHourlyStat(
+                    stat_hour=key[0],
+                    task_name=key[1],
+                    task_status=key[2],
+                    task_count=stat['count'],
+                    duration_sum=stat['sum'],
+                    duration_min=stat['min'],
+                    duration_max=stat['max'],
+                    duration_buckets=json.dumps(stat['buckets'])
+                ))
+            else:
+                row.task_count += stat['count']
+                row.duration_sum += stat['sum']
+                row.duration_min = _min(row.duration_min, stat['min'])
+                row.duration_max = _max(row.duration_max, stat['max'])
+                buckets = json.loads(row.duration_buckets) if row.duration_buckets else []
+                row.duration_buckets = json.dumps(_merge_buckets(buckets, stat['buckets']))
+    
+    # 标记已汇总, 显式保留 update_time 不被自动更新
+    for i in range(0, len(ids), MARK_BATCH_SIZE):
+        session.execute(
+            update(Task)
+            .where(Task.id.in_(ids[i:i + MARK_BATCH_SIZE]))
+            .values(task_rolled_up=True, update_time=Task.update_time)
+            .execution_options(synchronize_session=False)
+        )
+    
+    watermark.rollup_watermark = end
+    return len(ids), end
+
+def _percentile(buckets, q):
+    """根据耗时分布估算分位数, 返回所在桶的上界(秒), 超过最大上界时返回 None"""
+    total = sum(buckets)
+    if not total:
+        return None
+    threshold = total * q
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= threshold:
+            return ROLLUP_DURATION_BUCKETS[i] if i < len(ROLLUP_DURATION_BUCKETS) else None
+    return None
+
+def _summary(count, errors, successes, duration_sum, buckets):
+    timed = sum(buckets)
+    return {
+        'processed_items': count,
+        'errors': errors,
+        'success_rate': f"{successes * 100.0 / count:.1f}%" if count else '-',
+        'avg_duration': round(duration_sum / timed, 3) if timed else None,
+        'p95_duration': _percentile(buckets, 0.95),
+    }
+
+def summarize_task_stats(session, start, end):
+    """从小时汇总表读取 [start, end) 内的统计, 成本只与小时数和任务名称数相关"""
+    rows = session.query(TaskHourlyStat).filter(
+        TaskHourlyStat.stat_hour >= start,
+        TaskHourlyStat.stat_hour < end
+    ).all()
+    
+    per_task = {}
+    for row in rows:
+        item = per_task.setdefault(row.task_name, {'count': 0, 'errors': 0, 'successes': 0, 'sum': 0.0, 'buckets': []})
+        item['count'] += row.task_count
+        item['sum'] += row.duration_sum or 0.0
+        if row.task_status == 'FAILURE':
+            item['errors'] += row.task_count
+        elif row.task_status == 'SUCCESS':
+            item['successes'] += row.task_count
+        if row.duration_buckets:
+            item['buckets'] = _merge_buckets(item['buckets'], json.loads(row.duration_buckets))
+    
+    total = {'count': 0, 'errors': 0, 'successes': 0, 'sum': 0.0, 'buckets': []}
+    for item in per_task.values():
+        for field in ('count', 'errors', 'successes', 'sum'):
+            total[field] += item[field]
+        total['buckets'] = _merge_buckets(total['buckets'], item['buckets'])
+    
+    metrics = _summary(total['count'], total['errors'], total['successes'], total['sum'], total['buckets'])
+    metrics['tasks'] = {
+        name: _summary(item['count'], item['errors'], item['successes'], item['sum'], item['buckets'])
+        for name, item in sorted(per_task.items())
+    }
+    return metrics
@@ -0,0 +1,28 @@
+import logging
+from celery_app.config import SCHEDULE_VERSION_KEY, SCHEDULE_CHANGE_CHANNEL
+from celery_app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+def notify_schedule_changed():
+    """定时任务配置变更后调用: 递增版本号并发布变更消息
+
+    通知失败不影响写入本身, Beat 会通过兜底轮询获取变更
+    """
+    try:
+        client = get_redis()
+        version = client.incr(SCHEDULE_VERSION_KEY)
+        client.publish(SCHEDULE_CHANGE_CHANNEL, version)
+        return version
+    except Exception as e:
+        logger.warning(f"发布定时任务变更通知失败: {str(e)}")
+        return None
+
+def get_schedule_version():
+    """获取当前定时任务配置版本号, Redis 不可用时返回 None"""
+    try:
+        version = get_redis().get(SCHEDULE_VERSION_KEY)
+        return int(version) if version is not None else 0
+    except Exception as e:
+        logger.warning(f"获取定时任务版本号失败: {str(e)}")
+        return None
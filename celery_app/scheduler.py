@@ -1,9 +1,24 @@
 import json
+import time
+import logging
+import threading
 from datetime import datetime, timedelta
 from celery.beat import Scheduler
 from celery import current_app
 from celery.schedules import crontab, schedule
 from celery_app.models import get_session, PeriodicTask
+from celery_app.config import (
+    SCHEDULE_CHANGE_CHANNEL,
+    SCHEDULE_CHECK_INTERVAL,
+    SCHEDULE_VERSION_CHECK_INTERVAL,
+    SCHEDULE_FALLBACK_POLL_INTERVAL,
+    BACKPRESSURE_BEAT_POLICY,
+)
+from celery_app.backpressure import is_saturated, task_queue
+from celery_app.redis_client import get_redis
+from celery_app.schedule_version import get_schedule_version
+
+logger = logging.getLogger(__name__)
 
 class DatabaseScheduler(Scheduler):
     """从数据库加载定时任务的调度器"""
@@ -11,18 +26,41 @@ class DatabaseScheduler(Scheduler):
     def __init__(self, *args, **kwargs):
         self._schedule = {}
         self._last_timestamp = datetime.now()
+        self._last_reload_attempt = datetime.now()
+        self._last_version_check = datetime.now()
+        self._version = None
+        self._changed = threading.Event()
+        self._subscriber = None
+        self._critical = {}
+        self._deferred = {}
         super(DatabaseScheduler, self).__init__(*args, **kwargs)
     
     def setup_schedule(self):
-        self.update_from_database()
+        self.reload()
+        self._start_subscriber()
+    
+    def reload(self):
+        """读取版本号后重新加载定时任务, 先取版本号可避免漏掉加载期间的变更"""
+        version = get_schedule_version()
+        # 无论加载是否成功都推进兜底轮询时间, 数据库不可用时按兜底间隔重试, 而不是每次 tick 都重试
+        self._last_reload_attempt = datetime.now()
+        self._last_version_check = datetime.now()
+        if not self.update_from_database():
+            return
+        # merge_inplace 原地更新已有条目, tick 中的 schedules_equal 无法发现间隔/crontab 的修改,
+        # 清空堆使下次 tick 按新的调度重建
+        self._heap = None
+        if version is not None:
+            self._version = version
     
     def update_from_database(self):
-        """从数据库更新定时任务"""
+        """从数据库更新定时任务, 返回是否加载成功"""
         session = get_session()
         try:
             db_tasks = session.query(PeriodicTask).filter_by(task_enabled=True).all()
             
             self._schedule = {}
+            self._critical = {}
             
             for task in db_tasks:
                 # 解析参数
@@ -43,6 +81,8 @@ class DatabaseScheduler(Scheduler):
                         month_of_year=task.task_crontab_month_of_year or '*'
                     )
                 
+                self._critical[task.task_name] = task.task_critical is not False
+                
                 # 添加到调度中
                 self._schedule[task.task_name] = {
                     'task': task.task_path,
@@ -52,15 +92,88 @@ class DatabaseScheduler(Scheduler):
                     'options': {'expires': 60.0}
                 }
             
+            # 合并到 Beat 实际使用的调度表, 保留已有条目的上次运行时间
+            self.merge_inplace(self._schedule)
+            
             self._last_timestamp = datetime.now()
+            return True
             
         except Exception as e:
-            print(f"更新定时任务时出错: {e}")
+            logger.error(f"更新定时任务时出错: {str(e)}")
+            return False
         finally:
             session.close()
     
+    def _start_subscriber(self):
+        """启动后台线程订阅定时任务变更频道"""
+        if self._subscriber is not None:
+            return
+        self._subscriber = threading.Thread(
+            target=self._listen, name='schedule-change-subscriber', daemon=True
+        )
+        self._subscriber.start()
+    
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(SCHEDULE_CHANGE_CHANNEL)
+                # 重新订阅期间可能错过消息, 触发一次版本比对
+                self._changed.set()
+                # 客户端设置了 socket_timeout, 使用带超时的 get_message 代替阻塞的 listen
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._changed.set()
+            except Exception as e:
+                logger.warning(f"订阅定时任务变更频道出错, 5 秒后重试: {str(e)}")
+                time.sleep(5)
+    
+    def _has_changed(self):
+        """判断是否需要重新加载: 收到变更消息且版本号变化, 或到达版本比对间隔且版本号变化"""
+        now = datetime.now()
+        notified = self._changed.is_set()
+        if not notified and now - self._last_version_check < timedelta(seconds=SCHEDULE_VERSION_CHECK_INTERVAL):
+            return False
+        
+        self._changed.clear()
+        self._last_version_check = now
+        version = get_schedule_version()
+        return version is not None and version != self._version
+    
+    def apply_entry(self, entry, producer=None):
+        """非关键任务的目标队列饱和时按 BACKPRESSURE_BEAT_POLICY 跳过或推迟发送"""
+        if not self._critical.get(entry.name, True):
+            queue = task_queue(self.app, entry.task, entry.options)
+            if is_saturated(queue):
+                if BACKPRESSURE_BEAT_POLICY == 'defer':
+                    # 同一任务只保留一次待补发
+                    self._deferred[entry.name] = entry
+                    logger.warning(f"队列 {queue} 已饱和, 推迟定时任务 {entry.name}")
+                else:
+                    logger.warning(f"队列 {queue} 已饱和, 跳过定时任务 {entry.name}")
+                return
+        return super(DatabaseScheduler, self).apply_entry(entry, producer=producer)
+    
+    def _flush_deferred(self):
+        """队列恢复后补发被推迟的定时任务"""
+        for name, entry in list(self._deferred.items()):
+            if name not in self.schedule:
+                del self._deferred[name]
+            elif not is_saturated(task_queue(self.app, entry.task, entry.options)):
+                del self._deferred[name]
+                super(DatabaseScheduler, self).apply_entry(entry, producer=self.producer)
+    
     def tick(self, *args, **kwargs):
-        # 每分钟检查一次数据库更新
-        if datetime.now() - self._last_timestamp > timedelta(minutes=1):
-            self.update_from_database()
-        return super(DatabaseScheduler, self).tick(*args, **kwargs) 
\ No newline at end of file
+        if self._has_changed():
+            self.reload()
+        elif datetime.now() - self._last_reload_attempt > timedelta(seconds=SCHEDULE_FALLBACK_POLL_INTERVAL):
+            # 兜底轮询, 覆盖 Redis 不可用或绕过通知直接修改数据库的情况
+            self.reload()
+        
+        if self._deferred:
+            self._flush_deferred()
+        
+        interval = super(DatabaseScheduler, self).tick(*args, **kwargs)
+        # 限制休眠时间, 保证变更通知在 SCHEDULE_CHECK_INTERVAL 内生效
+        return min(interval, SCHEDULE_CHECK_INTERVAL)
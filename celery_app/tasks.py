@@ -1,10 +1,15 @@
 import time
 import logging
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from celery_app.celery import app
 from celery_app.models import get_session, Task, PeriodicTaskRun
-from celery.signals import task_prerun, task_postrun, task_failure
+from celery_app.memory import current_rss, peak_rss, reset_peak_rss
+from celery_app.profiling import start_profile, stop_profile
+from celery_app.rollup import rollup_task_stats, summarize_task_stats
+from celery_app.recorder import record
+from celery_app.ratelimit import acquire, release, start_refresher
+from celery.signals import task_prerun, task_postrun, task_failure, worker_process_init
 
 # 配置日志
 logging.basicConfig(
@@ -13,44 +18,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 任务开始时的内存 (KB), 以 task_id 为键, 在任务完成时取出
+_task_rss_before = {}
+
+# Worker 子进程启动时开始刷新限流规则
+@worker_process_init.connect
+def worker_process_init_handler(**kw):
+    start_refresher()
+
 # 任务开始前的处理
 @task_prerun.connect
 def task_prerun_handler(task_id=None, task=None, args=None, kwargs=None, **kw):
     if task.name.startswith('celery.'):
         return  # 跳过Celery内部任务
     
-    session = get_session()
-    try:
-        # 检查任务是否已存在
-        existing_task = session.query(Task).filter_by(task_id=task_id).first()
-        
-        if existing_task:
-            # 更新现有任务
-            existing_task.task_status = 'STARTED'
-            existing_task.task_start_time = datetime.now()
-            existing_task.task_retry_count += 1
-            existing_task.update_by = 'system'  # 添加更新人
-        else:
-            # 创建新任务记录
-            new_task = Task(
-                task_id=task_id,
-                task_name=task.name,
-                task_status='STARTED',
-                create_time=datetime.now(),
-                task_start_time=datetime.now(),
-                task_args=json.dumps(args) if args else None,
-                task_kwargs=json.dumps(kwargs) if kwargs else None,
-                create_by='system',  # 添加创建人
-                update_by='system'   # 添加更新人
-            )
-            session.add(new_task)
-        
-        session.commit()
-    except Exception as e:
-        logger.error(f"任务预处理错误: {str(e)}")
-        session.rollback()
-    finally:
-        session.close()
+    # 超出限流的任务不记录, 由 RateLimitedTask 延迟重新入队
+    countdown, leased = acquire(task.name, task_id)
+    # 记录是否占用了并发名额, 任务结束时据此释放
+    task.request.rate_limit_leased = leased
+    if countdown:
+        logger.info(f"任务 {task.name} ({task_id}) 被限流, {countdown:.1f} 秒后重新入队")
+        task.request.rate_limit_countdown = countdown
+        return
+    
+    # 记录由后台线程写入数据库, 不阻塞任务执行
+    record('prerun', {
+        'task_id': task_id,
+        'task_name': task.name,
+        'time': datetime.now().isoformat(),
+        'task_args': json.dumps(args, default=str) if args else None,
+        'task_kwargs': json.dumps(kwargs, default=str) if kwargs else None,
+        'task_root_id': task.request.root_id,
+        'task_parent_id': task.request.parent_id,
+        'task_group_id': task.request.group,
+    })
+    
+    # 在数据库写入之后采样, 避免把记录任务本身的开销计入任务
+    reset_peak_rss()
+    _task_rss_before[task_id] = current_rss()
+    
+    # 按配置对任务执行进行采样分析
+    start_profile(task_id, task.name)
 
 # 任务完成后的处理
 @task_postrun.connect
@@ -58,37 +66,41 @@ def task_postrun_handler(task_id=None, task=None, state=None, retval=None, **kw)
     if task.name.startswith('celery.'):
         return  # 跳过Celery内部任务
     
-    session = get_session()
-    try:
-        task_record = session.query(Task).filter_by(task_id=task_id).first()
-        if task_record:
-            task_record.task_status = state
-            task_record.task_complete_time = datetime.now()
-            task_record.task_result = json.dumps(retval) if retval is not None else None
-            task_record.update_by = 'system'  # 添加更新人
-            session.commit()
-    except Exception as e:
-        logger.error(f"任务后处理错误: {str(e)}")
-        session.rollback()
-    finally:
-        session.close()
+    if getattr(task.request, 'rate_limit_countdown', None):
+        return  # 被限流的任务未执行
+    
+    if getattr(task.request, 'rate_limit_leased', False):
+        release(task.name, task_id)
+    stop_profile(task_id)
+    
+    # 先采样内存, 再进行数据库写入
+    rss_before = _task_rss_before.pop(task_id, None)
+    rss_after = current_rss()
+    rss_peak = peak_rss()
+    logger.info(
+        f"任务内存统计: task_name={task.name} task_id={task_id} "
+        f"rss_before_kb={rss_before} rss_after_kb={rss_after} rss_peak_kb={rss_peak} "
+        f"rss_delta_kb={rss_after - rss_before if rss_before is not None else None}"
+    )
+    
+    record('postrun', {
+        'task_id': task_id,
+        'state': state,
+        'time': datetime.now().isoformat(),
+        'task_result': json.dumps(retval, default=str) if retval is not None else None,
+        'task_rss_before': rss_before,
+        'task_rss_after': rss_after,
+        'task_rss_peak': rss_peak,
+    })
 
 # 任务失败处理
 @task_failure.connect
 def task_failure_handler(task_id=None, exception=None, traceback=None, **kw):
-    session = get_session()
-    try:
-        task_record = session.query(Task).filter_by(task_id=task_id).first()
-        if task_record:
-            task_record.task_status = 'FAILURE'
-            task_record.task_complete_time = datetime.now()
-            task_record.task_traceback = str(traceback)
-            session.commit()
-    except Exception as e:
-        logger.error(f"任务失败处理错误: {str(e)}")
-        session.rollback()
-    finally:
-        session.close()
+    record('failure', {
+        'task_id': task_id,
+        'time': datetime.now().isoformat(),
+        'task_traceback': str(traceback),
+    })
 
 # 异步任务示例
 @app.task(bind=True, max_retries=3)
@@ -160,15 +172,29 @@ def daily_report():
     execution_time = datetime.now()
     logger.info(f"生成每日报告: {execution_time.isoformat()}")
     
-    # 生成报告逻辑
+    # 报告前一天的任务统计, 从小时汇总表读取, 不扫描任务记录表
+    report_end = execution_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    report_start = report_end - timedelta(days=1)
+    
+    session = get_session()
+    try:
+        # 先汇总上次水位之后的记录, 保证报告覆盖到最新
+        rollup_task_stats(session)
+        session.commit()
+        metrics = summarize_task_stats(session, report_start, report_end)
+        summary = f"共执行 {metrics['processed_items']} 个任务, 失败 {metrics['errors']} 个"
+    except Exception as e:
+        logger.error(f"生成每日报告统计错误: {str(e)}")
+        session.rollback()
+        metrics = None
+        summary = f"统计失败: {str(e)}"
+    finally:
+        session.close()
+    
     report_data = {
-        'date': execution_time.strftime('%Y-%m-%d'),
-        'summary': '这是一个示例报告',
-        'metrics': {
-            'processed_items': 1000,
-            'errors': 5,
-            'success_rate': '99.5%'
-        }
+        'date': report_start.strftime('%Y-%m-%d'),
+        'summary': summary,
+        'metrics': metrics
     }
     
     # 记录定时任务执行
@@ -192,6 +218,24 @@ def daily_report():
     # 可以在这里添加发送邮件或保存报告的逻辑
     return report_data
 
+@app.task
+def task_stats_rollup():
+    """
+    增量汇总任务记录到小时汇总表
+    """
+    session = get_session()
+    try:
+        count, watermark = rollup_task_stats(session)
+        session.commit()
+        logger.info(f"任务汇总完成: {count} 条记录, 水位 {watermark.isoformat()}")
+        return {'rolled_up': count, 'watermark': watermark.isoformat()}
+    except Exception as e:
+        logger.error(f"任务汇总错误: {str(e)}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 # 链式任务示例
 @app.task
 def process_data(data):
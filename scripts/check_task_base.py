@@ -0,0 +1,88 @@
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from celery import Celery
+from celery.signals import task_prerun
+
+# 检查任务基类 RateLimitedTask 不影响任务的请求上下文与重试, 以及被限流任务的重新入队
+# 使用内存 broker 在本进程内执行, 不导入 celery_app.tasks, 不需要 Redis 与数据库
+
+app = Celery('check_task_base', broker='memory://', task_cls='celery_app.base:RateLimitedTask')
+
+# 每次执行时的 (task_id, called_directly, retries)
+attempts = []
+
+@app.task(bind=True, max_retries=2)
+def retry_probe(self):
+    attempts.append((self.request.id, self.request.called_directly, self.request.retries))
+    if self.request.retries < self.max_retries:
+        raise self.retry(countdown=0)
+    return self.request.id
+
+@app.task(bind=True)
+def throttled_probe(self):
+    attempts.append((self.request.id, self.request.called_directly, self.request.retries))
+
+@task_prerun.connect
+def throttle(task=None, **kw):
+    # 模拟 celery_app.tasks 中的限流处理
+    if task.name == throttled_probe.name:
+        task.request.rate_limit_countdown = 1
+
+def check_retry():
+    """任务内 self.request.id 可用, retry() 按 max_retries 重试"""
+    attempts.clear()
+    result = retry_probe.apply()
+    ids = {task_id for task_id, _, _ in attempts}
+    
+    errors = []
+    if not result.successful():
+        errors.append(f"任务状态为 {result.state}, 预期 SUCCESS")
+    if len(attempts) != retry_probe.max_retries + 1:
+        errors.append(f"执行了 {len(attempts)} 次, 预期 {retry_probe.max_retries + 1} 次")
+    if ids != {result.id}:
+        errors.append(f"任务内的 request.id 为 {ids}, 预期 {result.id}")
+    if any(called_directly for _, called_directly, _ in attempts):
+        errors.append("任务内的 request.called_directly 为 True")
+    return errors
+
+def check_throttled():
+    """被限流的任务不执行, 以相同 task_id 重新入队"""
+    attempts.clear()
+    with app.connection_for_write() as conn:
+        queue = conn.SimpleQueue(app.conf.task_default_queue)
+        result = throttled_probe.apply()
+        
+        errors = []
+        if attempts:
+            errors.append("被限流的任务仍然执行")
+        if result.state != 'IGNORED':
+            errors.append(f"任务状态为 {result.state}, 预期 IGNORED")
+        try:
+            message = queue.get(timeout=1)
+        except queue.Empty:
+            errors.append("被限流的任务没有重新入队")
+        else:
+            if message.headers.get('id') != result.id:
+                errors.append(f"重新入队的 task_id 为 {message.headers.get('id')}, 预期 {result.id}")
+            message.ack()
+        queue.close()
+    return errors
+
+def main():
+    failed = False
+    for check in (check_retry, check_throttled):
+        errors = check()
+        print(f"{check.__name__}: {'失败' if errors else '通过'}")
+        for error in errors:
+            print(f"  {error}")
+        failed = failed or bool(errors)
+    
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
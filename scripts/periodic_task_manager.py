@@ -4,11 +4,13 @@ import json
 import argparse
 from datetime import datetime
 from tabulate import tabulate
+from sqlalchemy import insert, update, delete
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
 from celery_app.models import get_session, PeriodicTask
+from celery_app.schedule_version import notify_schedule_changed
 
 def list_tasks(args):
     """列出所有定时任务"""
@@ -69,6 +71,7 @@ def add_task(args):
             task_name=args.name,
             task_path=args.task,
             task_enabled=True,
+            task_critical=not args.non_critical,
             task_description=args.description,
             create_by=args.user or 'admin',  # 添加创建人
             update_by=args.user or 'admin'   # 添加更新人
@@ -90,6 +93,7 @@ def add_task(args):
         
         session.add(task)
         session.commit()
+        notify_schedule_changed()
         
         print(f"成功添加定时任务: {args.name}")
     except Exception as e:
@@ -122,6 +126,9 @@ def update_task(args):
         if args.enabled is not None:
             task.task_enabled = args.enabled.lower() == 'true'
         
+        if args.critical is not None:
+            task.task_critical = args.critical.lower() == 'true'
+        
         # 更新更新人
         task.update_by = args.user or 'admin'
         
@@ -168,6 +175,7 @@ def update_task(args):
             task.task_kwargs = json.dumps(kwargs_dict)
         
         session.commit()
+        notify_schedule_changed()
         
         print(f"成功更新任务: {task.task_name}")
     except Exception as e:
@@ -190,6 +198,7 @@ def delete_task(args):
         task_name = task.task_name
         session.delete(task)
         session.commit()
+        notify_schedule_changed()
         
         print(f"成功删除任务: {task_name}")
     except Exception as e:
@@ -198,6 +207,232 @@ def delete_task(args):
     finally:
         session.close()
 
+# 导入/导出时同步的字段, task_args/task_kwargs 在文件中以解析后的 JSON 结构保存
+SYNC_FIELDS = [
+    'task_path',
+    'task_interval',
+    'task_crontab_minute',
+    'task_crontab_hour',
+    'task_crontab_day_of_week',
+    'task_crontab_day_of_month',
+    'task_crontab_month_of_year',
+    'task_args',
+    'task_kwargs',
+    'task_enabled',
+    'task_critical',
+    'task_description',
+]
+
+# crontab 字段在数据库中为字符串
+CRONTAB_FIELDS = [
+    'task_crontab_minute',
+    'task_crontab_hour',
+    'task_crontab_day_of_week',
+    'task_crontab_day_of_month',
+    'task_crontab_month_of_year',
+]
+
+# 文件中允许的布尔值写法
+BOOL_VALUES = {'true': True, 'yes': True, 'on': True, '1': True, 'false': False, 'no': False, 'off': False, '0': False}
+
+def _is_yaml(path):
+    return path.lower().endswith(('.yaml', '.yml'))
+
+def _load_file(path):
+    """读取 JSON/YAML 文件, 返回任务列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if _is_yaml(path):
+            import yaml  # PyYAML 为可选依赖, 仅在处理 YAML 文件时需要
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    
+    # 兼容 {"tasks": [...]} 与直接列表两种格式
+    if isinstance(data, dict):
+        data = data.get('tasks', [])
+    return data or []
+
+def _dump_file(path, data):
+    """写入 JSON/YAML 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        if _is_yaml(path):
+            import yaml
+            yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def _task_to_dict(task):
+    """将数据库行转换为文件中的任务定义"""
+    item = {'task_name': task.task_name}
+    for field in SYNC_FIELDS:
+        item[field] = getattr(task, field)
+    item['task_args'] = json.loads(task.task_args) if task.task_args else []
+    item['task_kwargs'] = json.loads(task.task_kwargs) if task.task_kwargs else {}
+    item['task_enabled'] = bool(task.task_enabled)
+    item['task_critical'] = task.task_critical is not False
+    return item
+
+def _parse_bool(value, field):
+    """解析文件中的布尔值, 手工编辑的 "false"/"0" 等字符串不能按真值处理"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in BOOL_VALUES:
+        return BOOL_VALUES[value.strip().lower()]
+    raise ValueError(f"{field} 的值无效: {value!r} (可选 true/false)")
+
+def _normalize(item):
+    """将文件中的任务定义规范化为与 _task_to_dict 相同的结构"""
+    if not item.get('task_name') or not item.get('task_path'):
+        raise ValueError(f"任务定义缺少 task_name 或 task_path: {item}")
+    
+    result = {'task_name': item['task_name']}
+    for field in SYNC_FIELDS:
+        result[field] = item.get(field)
+    result['task_args'] = result['task_args'] or []
+    result['task_kwargs'] = result['task_kwargs'] or {}
+    result['task_enabled'] = True if result['task_enabled'] is None else _parse_bool(result['task_enabled'], 'task_enabled')
+    result['task_critical'] = True if result['task_critical'] is None else _parse_bool(result['task_critical'], 'task_critical')
+    # YAML 中的 minute: 0 会解析为整数, 与数据库中的字符串比较前统一转换
+    for field in CRONTAB_FIELDS:
+        if result[field] is not None:
+            result[field] = str(result[field])
+    return result
+
+def _to_row(item):
+    """将规范化的任务定义转换为数据库列值"""
+    row = dict(item)
+    row['task_args'] = json.dumps(item['task_args'])
+    row['task_kwargs'] = json.dumps(item['task_kwargs'])
+    return row
+
+def _pattern_to_like(pattern):
+    """将通配符模式 (*, ?) 转换为 SQL LIKE 模式"""
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+def export_tasks(args):
+    """导出所有定时任务到文件"""
+    session = get_session()
+    
+    try:
+        tasks = session.query(PeriodicTask).order_by(PeriodicTask.task_name).all()
+        data = [_task_to_dict(task) for task in tasks]
+        _dump_file(args.file, data)
+        print(f"成功导出 {len(data)} 个定时任务到: {args.file}")
+    except Exception as e:
+        print(f"导出任务失败: {str(e)}")
+    finally:
+        session.close()
+
+def import_tasks(args):
+    """从文件导入定时任务, 计算差异后在一个事务内批量执行"""
+    try:
+        items = [_normalize(item) for item in _load_file(args.file)]
+    except Exception as e:
+        print(f"读取文件失败: {str(e)}")
+        return
+    
+    desired = {}
+    for item in items:
+        if item['task_name'] in desired:
+            print(f"错误: 文件中任务名称 '{item['task_name']}' 重复")
+            return
+        desired[item['task_name']] = item
+    
+    user = args.user or 'admin'
+    session = get_session()
+    
+    try:
+        existing = {task.task_name: task for task in session.query(PeriodicTask).all()}
+        
+        inserts = []
+        updates = []
+        deletes = []
+        
+        for name, item in desired.items():
+            task = existing.get(name)
+            if task is None:
+                inserts.append(item)
+                continue
+            current = _task_to_dict(task)
+            changed = [field for field in SYNC_FIELDS if current[field] != item[field]]
+            if changed:
+                updates.append((task.id, item, changed))
+        
+        if not args.no_delete:
+            deletes = [task for name, task in existing.items() if name not in desired]
+        
+        # 打印差异摘要
+        rows = [["新增", item['task_name'], "-"] for item in inserts]
+        rows += [["更新", item['task_name'], ", ".join(changed)] for _, item, changed in updates]
+        rows += [["删除", task.task_name, "-"] for task in deletes]
+        if rows:
+            print(tabulate(rows, headers=["操作", "名称", "变更字段"], tablefmt="grid"))
+        print(f"新增: {len(inserts)}, 更新: {len(updates)}, 删除: {len(deletes)}, "
+              f"未变化: {len(desired) - len(inserts) - len(updates)}")
+        
+        if args.dry_run:
+            print("dry-run 模式, 未写入数据库")
+            return
+        
+        if not rows:
+            return
+        
+        now = datetime.now()
+        
+        if inserts:
+            session.execute(insert(PeriodicTask), [
+                dict(_to_row(item), create_time=now, update_time=now, create_by=user, update_by=user)
+                for item in inserts
+            ])
+        
+        if updates:
+            session.execute(update(PeriodicTask), [
+                dict(_to_row(item), id=task_id, update_time=now, update_by=user)
+                for task_id, item, _ in updates
+            ])
+        
+        if deletes:
+            session.execute(
+                delete(PeriodicTask).where(PeriodicTask.id.in_([task.id for task in deletes])),
+                execution_options={'synchronize_session': False}
+            )
+        
+        session.commit()
+        notify_schedule_changed()
+        print(f"成功导入定时任务: {args.file}")
+    except Exception as e:
+        session.rollback()
+        print(f"导入任务失败: {str(e)}")
+    finally:
+        session.close()
+
+def set_enabled_by_pattern(args, enabled):
+    """按名称模式批量启用/禁用定时任务 (单条 UPDATE)"""
+    session = get_session()
+    
+    try:
+        count = session.query(PeriodicTask).filter(
+            PeriodicTask.task_name.like(_pattern_to_like(args.pattern), escape='\\'),
+            PeriodicTask.task_enabled != enabled
+        ).update({
+            PeriodicTask.task_enabled: enabled,
+            PeriodicTask.update_time: datetime.now(),
+            PeriodicTask.update_by: args.user or 'admin',
+        }, synchronize_session=False)
+        session.commit()
+        if count:
+            notify_schedule_changed()
+        
+        print(f"成功{'启用' if enabled else '禁用'} {count} 个任务 (模式: {args.pattern})")
+    except Exception as e:
+        session.rollback()
+        print(f"批量{'启用' if enabled else '禁用'}任务失败: {str(e)}")
+    finally:
+        session.close()
+
 def main():
     parser = argparse.ArgumentParser(description='Celery 定时任务管理工具')
     subparsers = parser.add_subparsers(dest='command', help='命令')
@@ -217,6 +452,7 @@ def main():
     add_parser.add_argument('--month-of-year', help='Crontab月份 (1-12, *)')
     add_parser.add_argument('--args', help='参数列表 (逗号分隔)')
     add_parser.add_argument('--kwargs', help='关键字参数 (格式: key1=value1,key2=value2)')
+    add_parser.add_argument('--non-critical', action='store_true', help='非关键任务 (队列饱和时可被跳过)')
     add_parser.add_argument('--description', help='任务描述')
     add_parser.add_argument('--user', help='操作用户')
     
@@ -234,6 +470,7 @@ def main():
     update_parser.add_argument('--args', help='参数列表 (逗号分隔)')
     update_parser.add_argument('--kwargs', help='关键字参数 (格式: key1=value1,key2=value2)')
     update_parser.add_argument('--enabled', help='是否启用 (true/false)')
+    update_parser.add_argument('--critical', help='是否关键任务 (true/false)')
     update_parser.add_argument('--description', help='任务描述')
     update_parser.add_argument('--user', help='操作用户')
     
@@ -241,6 +478,26 @@ def main():
     delete_parser = subparsers.add_parser('delete', help='删除定时任务')
     delete_parser.add_argument('id', type=int, help='任务ID')
     
+    # 导出任务
+    export_parser = subparsers.add_parser('export', help='导出定时任务到 JSON/YAML 文件')
+    export_parser.add_argument('file', help='输出文件 (.json/.yaml/.yml)')
+    
+    # 导入任务
+    import_parser = subparsers.add_parser('import', help='从 JSON/YAML 文件同步定时任务')
+    import_parser.add_argument('file', help='输入文件 (.json/.yaml/.yml)')
+    import_parser.add_argument('--dry-run', action='store_true', help='只显示差异, 不写入数据库')
+    import_parser.add_argument('--no-delete', action='store_true', help='不删除文件中不存在的任务')
+    import_parser.add_argument('--user', help='操作用户')
+    
+    # 按模式启用/禁用任务
+    enable_parser = subparsers.add_parser('enable', help='按名称模式启用定时任务')
+    enable_parser.add_argument('pattern', help='任务名称模式 (支持 * 和 ? 通配符)')
+    enable_parser.add_argument('--user', help='操作用户')
+    
+    disable_parser = subparsers.add_parser('disable', help='按名称模式禁用定时任务')
+    disable_parser.add_argument('pattern', help='任务名称模式 (支持 * 和 ? 通配符)')
+    disable_parser.add_argument('--user', help='操作用户')
+    
     args = parser.parse_args()
     
     if args.command == 'list':
@@ -251,6 +508,14 @@ def main():
         update_task(args)
     elif args.command == 'delete':
         delete_task(args)
+    elif args.command == 'export':
+        export_tasks(args)
+    elif args.command == 'import':
+        import_tasks(args)
+    elif args.command == 'enable':
+        set_enabled_by_pattern(args, True)
+    elif args.command == 'disable':
+        set_enabled_by_pattern(args, False)
     else:
         parser.print_help()
 
@@ -0,0 +1,148 @@
+import os
+import sys
+import argparse
+from tabulate import tabulate
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from celery_app.models import get_session, TaskRateLimit
+from celery_app.ratelimit import notify_rate_limits_changed
+
+# 速率单位换算为秒
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+def parse_rate(value):
+    """解析速率, 支持 10 (每秒), 10/s, 100/m, 1000/h"""
+    if '/' in value:
+        count, unit = value.split('/', 1)
+        if unit not in RATE_UNITS:
+            raise argparse.ArgumentTypeError(f"无效的速率单位: {unit} (可选 s, m, h)")
+        return float(count) / RATE_UNITS[unit]
+    return float(value)
+
+def list_limits(args):
+    """列出所有限流规则"""
+    session = get_session()
+    
+    try:
+        limits = session.query(TaskRateLimit).order_by(TaskRateLimit.task_name).all()
+        
+        headers = ["ID", "任务名称", "每秒任务数", "令牌桶容量", "最大并发", "启用", "说明"]
+        rows = []
+        
+        for limit in limits:
+            rows.append([
+                limit.id,
+                limit.task_name,
+                limit.task_rate_limit if limit.task_rate_limit else "-",
+                limit.task_rate_burst if limit.task_rate_burst else "-",
+                limit.task_max_concurrency if limit.task_max_concurrency else "-",
+                "是" if limit.task_limit_enabled else "否",
+                limit.task_description or "-"
+            ])
+        
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    finally:
+        session.close()
+
+def set_limit(args):
+    """添加或更新任务的限流规则"""
+    session = get_session()
+    
+    try:
+        limit = session.query(TaskRateLimit).filter_by(task_name=args.name).first()
+        
+        if not limit:
+            limit = TaskRateLimit(
+                task_name=args.name,
+                task_limit_enabled=True,
+                create_by=args.user or 'admin'  # 添加创建人
+            )
+            session.add(limit)
+        
+        # 传入 0 表示取消对应限制
+        if args.rate is not None:
+            limit.task_rate_limit = args.rate or None
+        
+        if args.burst is not None:
+            limit.task_rate_burst = args.burst or None
+        
+        if args.max_concurrency is not None:
+            limit.task_max_concurrency = args.max_concurrency or None
+        
+        if args.enabled is not None:
+            limit.task_limit_enabled = args.enabled.lower() == 'true'
+        
+        if args.description:
+            limit.task_description = args.description
+        
+        # 更新更新人
+        limit.update_by = args.user or 'admin'
+        
+        session.commit()
+        notify_rate_limits_changed()
+        
+        print(f"成功设置限流规则: {args.name}")
+    except Exception as e:
+        session.rollback()
+        print(f"设置限流规则失败: {str(e)}")
+    finally:
+        session.close()
+
+def delete_limit(args):
+    """删除任务的限流规则"""
+    session = get_session()
+    
+    try:
+        limit = session.query(TaskRateLimit).filter_by(task_name=args.name).first()
+        
+        if not limit:
+            print(f"错误: 找不到任务 {args.name} 的限流规则")
+            return
+        
+        session.delete(limit)
+        session.commit()
+        notify_rate_limits_changed()
+        
+        print(f"成功删除限流规则: {args.name}")
+    except Exception as e:
+        session.rollback()
+        print(f"删除限流规则失败: {str(e)}")
+    finally:
+        session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Celery 任务限流管理工具')
+    subparsers = parser.add_subparsers(dest='command', help='命令')
+    
+    # 列出限流规则
+    list_parser = subparsers.add_parser('list', help='列出所有限流规则')
+    
+    # 设置限流规则
+    set_parser = subparsers.add_parser('set', help='添加或更新限流规则')
+    set_parser.add_argument('--name', required=True, help='任务名称 (例如: celery_app.tasks.long_running_task)')
+    set_parser.add_argument('--rate', type=parse_rate, help='启动速率 (10, 10/s, 100/m, 1000/h; 0 表示不限制)')
+    set_parser.add_argument('--burst', type=int, help='令牌桶容量 (允许的突发任务数)')
+    set_parser.add_argument('--max-concurrency', type=int, help='所有 Worker 合计的最大并发数 (0 表示不限制)')
+    set_parser.add_argument('--enabled', help='是否启用 (true/false)')
+    set_parser.add_argument('--description', help='限流说明')
+    set_parser.add_argument('--user', help='操作用户')
+    
+    # 删除限流规则
+    delete_parser = subparsers.add_parser('delete', help='删除限流规则')
+    delete_parser.add_argument('name', help='任务名称')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'list':
+        list_limits(args)
+    elif args.command == 'set':
+        set_limit(args)
+    elif args.command == 'delete':
+        delete_limit(args)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -20,10 +20,21 @@ CREATE TABLE IF NOT EXISTS `celery_task_records` (
   `task_retry_count` int(11) DEFAULT 0 COMMENT '重试次数',
   `task_args` text DEFAULT NULL COMMENT '任务参数',
   `task_kwargs` text DEFAULT NULL COMMENT '任务关键字参数',
+  `task_root_id` varchar(255) DEFAULT NULL COMMENT '工作流根任务ID',
+  `task_parent_id` varchar(255) DEFAULT NULL COMMENT '父任务ID',
+  `task_group_id` varchar(255) DEFAULT NULL COMMENT '所属组ID',
+  `task_rss_before` int(11) DEFAULT NULL COMMENT '任务开始时内存(KB)',
+  `task_rss_after` int(11) DEFAULT NULL COMMENT '任务结束时内存(KB)',
+  `task_rss_peak` int(11) DEFAULT NULL COMMENT '任务执行期间峰值内存(KB)',
+  `task_rolled_up` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已计入小时汇总',
   PRIMARY KEY (`id`),
   UNIQUE KEY `task_id` (`task_id`),
   KEY `idx_task_status` (`task_status`),
-  KEY `idx_create_time` (`create_time`)
+  KEY `idx_create_time` (`create_time`),
+  KEY `idx_task_rolled_up_update_time` (`task_rolled_up`, `update_time`),
+  KEY `idx_task_name` (`task_name`),
+  KEY `idx_task_root_id` (`task_root_id`),
+  KEY `idx_task_group_id` (`task_group_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='异步任务记录表';
 
 -- 定时任务执行记录表
@@ -57,6 +68,7 @@ CREATE TABLE IF NOT EXISTS `celery_periodic_task_configs` (
   `task_args` text DEFAULT NULL COMMENT 'JSON格式的参数',
   `task_kwargs` text DEFAULT NULL COMMENT 'JSON格式的关键字参数',
   `task_enabled` tinyint(1) DEFAULT 1 COMMENT '是否启用',
+  `task_critical` tinyint(1) DEFAULT 1 COMMENT '是否关键任务(队列饱和时仍照常发送)',
   `task_last_run_time` datetime DEFAULT NULL COMMENT '上次运行时间',
   `task_run_count` int(11) DEFAULT 0 COMMENT '总运行次数',
   `create_time` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
@@ -67,4 +79,74 @@ CREATE TABLE IF NOT EXISTS `celery_periodic_task_configs` (
   PRIMARY KEY (`id`),
   UNIQUE KEY `task_name` (`task_name`),
   KEY `idx_task_enabled` (`task_enabled`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='定时任务配置表'; 
\ No newline at end of file
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='定时任务配置表'; 
+
+-- 任务限流配置表
+CREATE TABLE IF NOT EXISTS `celery_task_rate_limits` (
+  `id` int(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `task_name` varchar(255) NOT NULL COMMENT '任务名称',
+  `task_rate_limit` double DEFAULT NULL COMMENT '每秒允许启动的任务数',
+  `task_rate_burst` int(11) DEFAULT NULL COMMENT '令牌桶容量',
+  `task_max_concurrency` int(11) DEFAULT NULL COMMENT '最大并发数',
+  `task_limit_enabled` tinyint(1) DEFAULT 1 COMMENT '是否启用',
+  `create_time` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `update_time` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  `create_by` varchar(100) DEFAULT NULL COMMENT '创建人',
+  `update_by` varchar(100) DEFAULT NULL COMMENT '更新人',
+  `task_description` text DEFAULT NULL COMMENT '限流说明',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `task_name` (`task_name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='任务限流配置表';
+
+-- 异步任务小时汇总表
+CREATE TABLE IF NOT EXISTS `celery_task_hourly_stats` (
+  `id` int(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `stat_hour` datetime NOT NULL COMMENT '统计小时',
+  `task_name` varchar(255) NOT NULL COMMENT '任务名称',
+  `task_status` varchar(50) NOT NULL COMMENT '任务状态',
+  `task_count` int(11) DEFAULT 0 COMMENT '任务数',
+  `duration_sum` double DEFAULT 0 COMMENT '执行耗时合计(秒)',
+  `duration_min` double DEFAULT NULL COMMENT '最小执行耗时(秒)',
+  `duration_max` double DEFAULT NULL COMMENT '最大执行耗时(秒)',
+  `duration_buckets` text DEFAULT NULL COMMENT 'JSON格式的耗时分布',
+  `create_time` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `update_time` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_hour_name_status` (`stat_hour`, `task_name`, `task_status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='异步任务小时汇总表';
+
+-- 汇总任务水位表
+CREATE TABLE IF NOT EXISTS `celery_rollup_watermarks` (
+  `id` int(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `rollup_name` varchar(100) NOT NULL COMMENT '汇总名称',
+  `rollup_watermark` datetime NOT NULL COMMENT '已汇总到的任务记录写入时间(update_time)',
+  `create_time` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `update_time` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `rollup_name` (`rollup_name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='汇总任务水位表';
+
+-- 已有库升级: 异步任务内存统计字段
+-- ALTER TABLE `celery_task_records`
+--   ADD COLUMN `task_rss_before` int(11) DEFAULT NULL COMMENT '任务开始时内存(KB)',
+--   ADD COLUMN `task_rss_after` int(11) DEFAULT NULL COMMENT '任务结束时内存(KB)',
+--   ADD COLUMN `task_rss_peak` int(11) DEFAULT NULL COMMENT '任务执行期间峰值内存(KB)',
+--   ADD KEY `idx_task_name` (`task_name`);
+
+-- 已有库升级: 工作流关系字段
+-- ALTER TABLE `celery_task_records`
+--   ADD COLUMN `task_root_id` varchar(255) DEFAULT NULL COMMENT '工作流根任务ID',
+--   ADD COLUMN `task_parent_id` varchar(255) DEFAULT NULL COMMENT '父任务ID',
+--   ADD COLUMN `task_group_id` varchar(255) DEFAULT NULL COMMENT '所属组ID',
+--   ADD KEY `idx_task_root_id` (`task_root_id`),
+--   ADD KEY `idx_task_group_id` (`task_group_id`);
+
+-- 已有库升级: 按写入时间增量汇总 (之前按完成时间汇总时添加的 idx_task_complete_time 不再使用)
+-- ALTER TABLE `celery_task_records`
+--   ADD COLUMN `task_rolled_up` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已计入小时汇总',
+--   ADD KEY `idx_task_rolled_up_update_time` (`task_rolled_up`, `update_time`);
+-- ALTER TABLE `celery_task_records` DROP KEY `idx_task_complete_time`;
+
+-- 已有库升级: 定时任务背压
+-- ALTER TABLE `celery_periodic_task_configs`
+--   ADD COLUMN `task_critical` tinyint(1) DEFAULT 1 COMMENT '是否关键任务(队列饱和时仍照常发送)' AFTER `task_enabled`;
@@ -0,0 +1,86 @@
+import os
+import sys
+import argparse
+import subprocess
+from tabulate import tabulate
+
+# 项目根目录
+ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+# 启动耗时基准: 名称 -> (启动参数, 导入耗时预算(毫秒))
+# 管理脚本以 --help 启动, 导入的模块与实际命令相同 (模型与 SQLAlchemy), 只是不连接数据库
+# models 覆盖所有访问数据库的命令在首次查询前的路径: 导入模型并创建引擎 (加载 PyMySQL 与 MySQL 方言)
+# run_beat 额外导入调度器, 覆盖 Beat 启动时加载的 celery.beat、模型与 SQLAlchemy
+# 其中 SQLAlchemy 自身的导入约 270-300 毫秒, 是这些路径的下限
+# 预算约为实测中位数的 2 倍 (models 约 320-390 毫秒, CLI 约 300-480 毫秒, run_beat 约 400-450 毫秒), 部署机器差异较大时按实测中位数调整
+TARGETS = {
+    'models': (['-c', 'from celery_app.models import get_engine; get_engine()'], 750),
+    'task_manager': (['scripts/task_manager.py', '--help'], 800),
+    'periodic_task_manager': (['scripts/periodic_task_manager.py', '--help'], 800),
+    'rate_limit_manager': (['scripts/rate_limit_manager.py', '--help'], 800),
+    'run_beat': (['-c', 'import run_beat, celery_app.scheduler'], 800),
+}
+
+def measure(argv):
+    """使用 -X importtime 启动一次, 返回 (总导入耗时(微秒), {模块: 累计耗时(微秒)})"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + argv,
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    
+    total = 0
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        cumulative = int(cumulative)
+        # 没有缩进的为顶层导入, 其累计耗时之和即为总导入耗时
+        if not name.startswith('  '):
+            total += cumulative
+        modules[name.strip()] = max(cumulative, modules.get(name.strip(), 0))
+    
+    return total, modules
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI 与 Beat 启动耗时基准')
+    parser.add_argument('targets', nargs='*', help=f"基准目标 (可选: {', '.join(sorted(TARGETS))}, 默认全部)")
+    parser.add_argument('--repeat', type=int, default=5, help='每个目标运行次数, 取中位数')
+    parser.add_argument('--top', type=int, default=10, help='显示耗时最多的模块数')
+    
+    args = parser.parse_args()
+    
+    for name in args.targets:
+        if name not in TARGETS:
+            parser.error(f"未知的基准目标: {name}")
+    
+    failed = []
+    rows = []
+    
+    for name in args.targets or sorted(TARGETS):
+        argv, budget = TARGETS[name]
+        runs = sorted((measure(argv) for _ in range(args.repeat)), key=lambda run: run[0])
+        # 取中位数, 单次抖动不影响结果
+        total, modules = runs[len(runs) // 2]
+        total_ms = total / 1000
+        
+        over = total_ms > budget
+        if over:
+            failed.append(name)
+        rows.append([name, f"{total_ms:.1f}", budget, "超出" if over else "通过"])
+        
+        if args.top:
+            print(f"\n{name} 耗时最多的模块:")
+            top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            print(tabulate([[module, f"{cost / 1000:.1f}"] for module, cost in top],
+                           headers=["模块", "累计耗时(毫秒)"], tablefmt="grid"))
+    
+    print()
+    print(tabulate(rows, headers=["目标", "导入耗时(毫秒)", "预算(毫秒)", "结果"], tablefmt="grid"))
+    
+    if failed:
+        print(f"启动耗时超出预算: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
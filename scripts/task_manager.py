@@ -7,6 +7,8 @@ from tabulate import tabulate
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
+from collections import Counter
+from sqlalchemy import func, or_, select
 from celery_app.models import get_session, Task
 
 def list_tasks(args):
@@ -57,6 +59,9 @@ def show_task_details(args):
         print(f"完成时间: {task.task_complete_time.strftime('%Y-%m-%d %H:%M:%S') if task.task_complete_time else '-'}")
         print(f"重试次数: {task.task_retry_count}")
         
+        if task.task_rss_peak is not None:
+            print(f"内存(KB): 开始 {task.task_rss_before or '-'}, 结束 {task.task_rss_after}, 峰值 {task.task_rss_peak}")
+        
         if task.task_args:
             print(f"参数: {task.task_args}")
         
@@ -77,6 +82,167 @@ def show_task_details(args):
     finally:
         session.close()
 
+def memory_stats(args):
+    """按任务名称统计内存使用, 按峰值内存排序"""
+    session = get_session()
+    
+    try:
+        query = session.query(
+            Task.task_name,
+            func.count(Task.id),
+            func.avg(Task.task_rss_peak),
+            func.max(Task.task_rss_peak),
+            func.avg(Task.task_rss_after - Task.task_rss_before),
+            func.max(Task.task_rss_after - Task.task_rss_before)
+        ).filter(Task.task_rss_peak.isnot(None))
+        
+        if args.name:
+            query = query.filter(Task.task_name == args.name)
+        
+        stats = query.group_by(Task.task_name).order_by(func.max(Task.task_rss_peak).desc()).limit(args.limit).all()
+        
+        headers = ["名称", "执行次数", "平均峰值(KB)", "最大峰值(KB)", "平均增长(KB)", "最大增长(KB)"]
+        rows = []
+        
+        for name, count, avg_peak, max_peak, avg_delta, max_delta in stats:
+            rows.append([
+                name,
+                count,
+                int(avg_peak) if avg_peak is not None else "-",
+                max_peak,
+                int(avg_delta) if avg_delta is not None else "-",
+                max_delta if max_delta is not None else "-"
+            ])
+        
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    finally:
+        session.close()
+
+def _parse_since(value):
+    """解析时间: 相对时间 (30m, 12h, 7d) 或 ISO 格式时间 (2024-01-01, 2024-01-01 12:00)"""
+    from datetime import datetime, timedelta
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+    if value[-1:] in units and value[:-1].isdigit():
+        return datetime.now() - timedelta(**{units[value[-1]]: int(value[:-1])})
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的时间: {value}")
+
+def profile_report(args):
+    """合并指定任务的分析文件, 输出热点函数"""
+    # 仅此命令使用, 延迟导入以缩短其他命令的启动时间
+    import pstats
+    from celery_app.profiling import profile_path, profile_files
+    
+    files = profile_files(args.task_name)
+    
+    if args.since:
+        since = args.since.timestamp()
+        files = [item for item in files if item[0] >= since]
+    
+    if args.last:
+        files = files[-args.last:]
+    
+    files = [path for _, path in files]
+    
+    if not files:
+        print(f"找不到任务 {args.task_name} 符合条件的分析文件 ({profile_path(args.task_name)})")
+        return
+    
+    stats = pstats.Stats(files[0])
+    for path in files[1:]:
+        stats.add(path)
+    
+    print(f"合并 {len(files)} 个分析文件: {profile_path(args.task_name)}")
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+def _duration(start, end):
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+def show_workflow(args):
+    """显示任务所在工作流 (链/组) 的全部任务及耗时"""
+    session = get_session()
+    
+    try:
+        # 通过子查询定位根任务与所属组, 一次查询取回整个工作流
+        # 独立的 group() 中每个成员的根任务是其自身, 成员之间只共享组ID
+        root_id = select(
+            func.coalesce(Task.task_root_id, Task.task_id)
+        ).where(Task.task_id == args.task_id).scalar_subquery()
+        group_id = select(Task.task_group_id).where(Task.task_id == args.task_id).scalar_subquery()
+        tasks = session.query(Task).filter(
+            or_(Task.task_root_id == root_id, Task.task_id == root_id, Task.task_group_id == group_id)
+        ).all()
+        
+        if not tasks:
+            print(f"找不到任务ID为 {args.task_id} 的任务")
+            return
+        
+        by_id = {task.task_id: task for task in tasks}
+        children = {}
+        roots = []
+        for task in tasks:
+            if task.task_parent_id in by_id and task.task_parent_id != task.task_id:
+                children.setdefault(task.task_parent_id, []).append(task)
+            else:
+                roots.append(task)
+        
+        def start_key(task):
+            return task.task_start_time or task.create_time
+        
+        starts = [task.task_start_time for task in tasks if task.task_start_time]
+        ends = [task.task_complete_time for task in tasks if task.task_complete_time]
+        workflow_start = min(starts) if starts else None
+        
+        # 关键路径: 从最晚完成的任务沿父任务回溯
+        critical = set()
+        if ends:
+            node = max((task for task in tasks if task.task_complete_time), key=lambda t: t.task_complete_time)
+            while node is not None and node.task_id not in critical:
+                critical.add(node.task_id)
+                node = by_id.get(node.task_parent_id)
+        
+        headers = ["", "任务ID", "名称", "状态", "组ID", "开始偏移(秒)", "耗时(秒)"]
+        rows = []
+        
+        # 使用显式栈遍历, 避免长链超过递归深度
+        stack = [(task, 0) for task in sorted(roots, key=start_key, reverse=True)]
+        while stack:
+            task, depth = stack.pop()
+            duration = _duration(task.task_start_time, task.task_complete_time)
+            offset = _duration(workflow_start, task.task_start_time)
+            # tabulate 会去掉首尾空白, 层级前缀使用非空白字符
+            rows.append([
+                "*" if task.task_id in critical else "",
+                ("│ " * (depth - 1) + "└─ " if depth else "") + task.task_id,
+                task.task_name,
+                task.task_status,
+                task.task_group_id[:8] if task.task_group_id else "-",
+                f"{offset:.3f}" if offset is not None else "-",
+                f"{duration:.3f}" if duration is not None else "-"
+            ])
+            for child in sorted(children.get(task.task_id, []), key=start_key, reverse=True):
+                stack.append((child, depth + 1))
+        
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+        
+        status_counts = Counter(task.task_status for task in tasks)
+        print(f"任务数: {len(tasks)} ({', '.join(f'{k}: {v}' for k, v in sorted(status_counts.items()))})")
+        total = _duration(workflow_start, max(ends)) if ends and workflow_start else None
+        if total is not None:
+            print(f"总耗时: {total:.3f} 秒")
+        if critical:
+            critical_time = sum(
+                _duration(by_id[task_id].task_start_time, by_id[task_id].task_complete_time) or 0
+                for task_id in critical
+            )
+            print(f"关键路径 (*): {len(critical)} 个任务, 执行耗时 {critical_time:.3f} 秒")
+    finally:
+        session.close()
+
 def main():
     parser = argparse.ArgumentParser(description='Celery 任务管理工具')
     subparsers = parser.add_subparsers(dest='command', help='命令')
@@ -90,12 +256,35 @@ def main():
     details_parser.add_argument('task_id', help='任务ID')
     details_parser.add_argument('--show-result', action='store_true', help='显示任务结果')
     
+    # 工作流
+    workflow_parser = subparsers.add_parser('workflow', help='显示任务所在工作流 (链/组)')
+    workflow_parser.add_argument('task_id', help='工作流中任意任务的ID')
+    
+    # 内存统计
+    memory_parser = subparsers.add_parser('memory', help='按任务名称统计内存使用')
+    memory_parser.add_argument('--name', help='按任务名称筛选')
+    memory_parser.add_argument('--limit', type=int, default=20, help='显示条数')
+    
+    # 采样分析报告
+    profile_parser = subparsers.add_parser('profile', help='合并任务分析文件并输出热点')
+    profile_parser.add_argument('task_name', help='任务名称 (例如: celery_app.tasks.long_running_task)')
+    profile_parser.add_argument('--top', type=int, default=20, help='显示前 N 个函数')
+    profile_parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'], help='排序字段')
+    profile_parser.add_argument('--since', type=_parse_since, help='只合并此时间之后的分析文件 (如 24h, 7d, 2024-01-01)')
+    profile_parser.add_argument('--last', type=int, help='只合并最近 N 个分析文件')
+    
     args = parser.parse_args()
     
     if args.command == 'list':
         list_tasks(args)
     elif args.command == 'details':
         show_task_details(args)
+    elif args.command == 'workflow':
+        show_workflow(args)
+    elif args.command == 'memory':
+        memory_stats(args)
+    elif args.command == 'profile':
+        profile_report(args)
     else:
         parser.print_help()
 
@@ -33,6 +33,8 @@ def test_chain_task():
     print(f"任务ID: {result.id}")
     print("任务已提交，可以使用以下命令查看任务状态:")
     print(f"python scripts/task_manager.py details {result.id} --show-result")
+    print("查看整个工作流:")
+    print(f"python scripts/task_manager.py workflow {result.id}")
 
 def test_failing_task():
     """测试失败的任务"""